@@ -6,140 +6,375 @@ Randomly select N S&P-500 tickers whose option chains show above-median
 liquidity, cache the S&P-500 roster *and* the per-ticker open-interest table,
 and print each pick’s rank & percentile in a slim, readable line.
 
-    pip install pandas yfinance requests beautifulsoup4 lxml
+    pip install numpy pandas curl_cffi requests lxml
 """
 from __future__ import annotations
 
 import argparse
-import datetime as dt
+import hashlib
 import json
+import os
 import random
-import warnings
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from pathlib import Path
 from typing import Dict, List
 
+import lxml.html
+import numpy as np
 import pandas as pd
-import yfinance as yf
+import requests
+from curl_cffi import requests as curl_requests
 
 # ─── Configurable bits ────────────────────────────────────────────────────────
+ROSTER_URL         = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+USER_AGENT         = "OptionSpinner/1.0 (https://github.com/sdrasco/OptionSpinner)"
 CACHE_PATH         = Path("sp500_members.json")          # roster cache
-LIQ_CSV_PATH       = Path("sp500_option_liquidity.csv")  # liquidity cache
-MAX_CACHE_AGE_DAYS = 7                                   # both caches
+LIQ_DB_PATH        = Path("sp500_option_liquidity.db")   # liquidity cache
+MAX_CACHE_AGE_DAYS = 7                                   # per-ticker OI
+MAX_WORKERS        = min(12, (os.cpu_count() or 1) * 5)  # parallel OI fetches
+JITTER_SECONDS     = 0.25                                # max pre-request sleep
+YAHOO_RATE         = 10.0                                # Yahoo requests / second
+MAX_RETRIES        = 5                                   # per ticker, on 429/503
+RETRY_STATUSES     = frozenset({429, 503})               # back off and retry
+YAHOO_OPTIONS_URL  = "https://query2.finance.yahoo.com/v7/finance/options"
+YAHOO_COOKIE_URL   = "https://fc.yahoo.com"
+YAHOO_CRUMB_URL    = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+WRITE_BATCH        = 32                                  # OI rows per DB commit
+CACHE_ENABLED      = (                                   # 0/false/no/off = none
+    os.environ.get("CACHE_ENABLED", "1").strip().lower()
+    not in {"0", "false", "no", "off"}
+)
 # ──────────────────────────────────────────────────────────────────────────────
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 1.  S&P-500 membership helpers
 # ═════════════════════════════════════════════════════════════════════════════
-def scrape_sp500_members() -> List[str]:
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    df = pd.read_html(url, flavor="lxml")[0]
-    return df["Symbol"].str.strip().tolist()
+def scrape_sp500_members(content: bytes) -> List[str]:
+    """Symbols from the first column of the ``constituents`` table only."""
+    tree = lxml.html.fromstring(content)
+    cells = tree.xpath('//table[@id="constituents"]//tr/td[1]')
+    if not cells:
+        raise RuntimeError("S&P-500 constituents table not found on page.")
+    return [td.text_content().strip() for td in cells]
 
 
-def load_cached_members() -> tuple[List[str] | None, dt.date | None]:
+def load_cached_members() -> dict | None:
     if not CACHE_PATH.exists():
-        return None, None
+        return None
     try:
         data = json.loads(CACHE_PATH.read_text())
-        return data["tickers"], dt.date.fromisoformat(data["as_of"])
+        return data if isinstance(data.get("tickers"), list) else None
     except Exception:
-        return None, None
-
-
-def save_members(tickers: List[str]) -> None:
-    payload = {"tickers": tickers, "as_of": dt.date.today().isoformat()}
+        return None
+
+
+def save_members(
+    tickers: List[str], etag: str | None, last_modified: str | None, digest: str
+) -> None:
+    payload = {
+        "tickers": tickers,
+        "etag": etag,
+        "last_modified": last_modified,
+        "digest": digest,
+    }
     CACHE_PATH.write_text(json.dumps(payload, indent=2))
 
 
 def get_sp500_members(force_refresh: bool = False) -> List[str]:
-    cached, as_of = load_cached_members()
-    cache_age = (dt.date.today() - as_of).days if as_of else None
-    stale = cache_age is None or cache_age > MAX_CACHE_AGE_DAYS
+    """
+    Revalidate the cached roster against Wikipedia on every run instead of
+    trusting a fixed age: a conditional GET (ETag / Last-Modified)
+    answers 304 when the page is unchanged, and a body digest catches
+    unchanged pages served without validators. The HTML is only parsed when
+    the page actually changed.
+    """
+    cache  = load_cached_members() if CACHE_ENABLED else None
+    cached = cache["tickers"] if cache else None
+
+    headers = {"User-Agent": USER_AGENT}
+    if cache and not force_refresh:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+    try:
+        resp = requests.get(ROSTER_URL, headers=headers, timeout=10)
+        resp.raise_for_status()
+    except requests.RequestException as exc:
+        if not cached:
+            raise
+        print(f"Roster check failed ({exc}); using {len(cached)} cached members.")
+        return cached
+
+    if resp.status_code == 304:
+        print(f"Loaded {len(cached)} members from cache (unchanged upstream).")
+        return cached
 
-    if not force_refresh and cached and not stale:
-        print(f"Loaded {len(cached)} members from cache (age {cache_age} days).")
+    digest = hashlib.blake2b(resp.content, digest_size=16).hexdigest()
+    etag   = resp.headers.get("ETag")
+    lm     = resp.headers.get("Last-Modified")
+    if not force_refresh and cached and digest == cache.get("digest"):
+        save_members(cached, etag, lm, digest)
+        print(f"Loaded {len(cached)} members from cache (unchanged upstream).")
         return cached
 
     print("Refreshing S&P-500 membership …")
-    fresh = scrape_sp500_members()
+    fresh = scrape_sp500_members(resp.content)
     if cached:
         added   = sorted(set(fresh) - set(cached))
         dropped = sorted(set(cached) - set(fresh))
         if added or dropped:
             print("  ▸ Additions:", ", ".join(added) or "None")
             print("  ▸ Deletions:", ", ".join(dropped) or "None")
-    save_members(fresh)
-    print(f"Cached {len(fresh)} tickers → {CACHE_PATH}")
+    if CACHE_ENABLED:
+        save_members(fresh, etag, lm, digest)
+        print(f"Cached {len(fresh)} tickers → {CACHE_PATH}")
     return fresh
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 2.  Option-liquidity utilities
 # ═════════════════════════════════════════════════════════════════════════════
-def option_liquidity_metric(ticker: str) -> int:
+# One browser-fingerprinted session for every Yahoo request: it pools the
+# connections and holds the cookie that the crumb is tied to.
+_yahoo_session = curl_requests.Session(impersonate="chrome")
+
+# Set when a build is interrupted so in-flight fetches stop retrying and sleeping.
+_cancelled = threading.Event()
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: ``rate`` calls/second, bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = float(burst)
+        self.stamp  = time.monotonic()
+        self.lock   = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                refill = (now - self.stamp) * self.rate
+                self.tokens = min(self.burst, self.tokens + refill)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Every request this script sends to Yahoo, whatever the endpoint, draws from it.
+_yahoo_bucket = TokenBucket(YAHOO_RATE, burst=MAX_WORKERS)
+
+_crumb: str | None = None
+_crumb_lock = threading.Lock()
+
+
+def yahoo_crumb(
+    session: curl_requests.Session, rejected: str | None = None
+) -> str | None:
     """
-    Total open interest (calls + puts) on the nearest expiry.
-    Returns 0 if retrieval fails.
+    Cookie + crumb for Yahoo's API, fetched once and shared by all threads.
+    Pass the crumb Yahoo just rejected to force a new handshake. Returns None
+    if Yahoo throttles the handshake (HTTP 429/503), so the caller backs off.
     """
-    try:
-        tk = yf.Ticker(ticker)
-        exps = tk.options
-        if not exps:
-            return 0
-        chain = tk.option_chain(exps[0])
-        return int(
-            chain.calls["openInterest"].fillna(0).sum()
-            + chain.puts["openInterest"].fillna(0).sum()
-        )
-    except Exception:
-        return 0
+    global _crumb
+    with _crumb_lock:
+        if _crumb is None or _crumb == rejected:
+            _crumb = None
+            _yahoo_bucket.acquire()
+            session.get(YAHOO_COOKIE_URL, allow_redirects=True, timeout=30)
+            _yahoo_bucket.acquire()
+            resp = session.get(YAHOO_CRUMB_URL, timeout=30)
+            if resp.status_code in RETRY_STATUSES:
+                return None
+            resp.raise_for_status()
+            if not resp.text or "<" in resp.text:
+                raise RuntimeError("Yahoo did not return a crumb.")
+            _crumb = resp.text
+        return _crumb
+
+
+def option_liquidity_metric(
+    ticker: str, session: curl_requests.Session = _yahoo_session
+) -> int | None:
+    """
+    Total open interest (calls + puts) on the nearest expiry, from one v7
+    options request. Retries HTTP 429/503; returns None if retrieval fails.
+    """
+    if _cancelled.wait(random.uniform(0, JITTER_SECONDS)):  # polite jitter
+        return None
+    url = f"{YAHOO_OPTIONS_URL}/{ticker}"
+    rejected = None
+    for attempt in range(MAX_RETRIES + 1):
+        if _cancelled.is_set():
+            return None
+        try:
+            crumb = yahoo_crumb(session, rejected)
+            if crumb is not None:
+                _yahoo_bucket.acquire()
+                resp = session.get(url, params={"crumb": crumb}, timeout=30)
+                if resp.status_code == 401:  # crumb expired: re-handshake
+                    rejected = crumb
+                    continue
+                if resp.status_code not in RETRY_STATUSES:
+                    resp.raise_for_status()
+                    result = resp.json()["optionChain"]["result"]
+                    options = result[0].get("options", []) if result else []
+                    chain = options[0] if options else {}
+                    return sum(
+                        c.get("openInterest") or 0
+                        for side in ("calls", "puts")
+                        for c in chain.get(side, ())
+                    )
+        except Exception:
+            return None
+        if attempt < MAX_RETRIES:
+            if _cancelled.wait(min(60, 2 ** attempt + random.random())):
+                return None
+    return None  # still throttled (or crumb rejected) after every retry
+
+
+def build_liquidity_table(
+    tickers: List[str],
+    max_workers: int = MAX_WORKERS,
+    conn: sqlite3.Connection | None = None,
+) -> Dict[str, int | None]:
+    """
+    Fetch open interest for every ticker on a thread pool; the work is pure
+    network wait, so threads overlap nicely. Progress prints in completion order.
 
+    All requests share one curl_cffi session (Yahoo expects its browser
+    fingerprint), so TCP/TLS connections are pooled across tickers.
 
-def build_liquidity_table(tickers: List[str]) -> Dict[str, int]:
-    liq: Dict[str, int] = {}
-    for i, tkr in enumerate(tickers, 1):
-        print(f"[{i:>3}/{len(tickers)}] {tkr:<5} …", end=" ")
-        oi = option_liquidity_metric(tkr)
-        liq[tkr] = oi
-        print(f"OI {oi:,}")
-    return liq
+    With ``conn`` given, results are written through to the liquidity table
+    every ``WRITE_BATCH`` rows, so an interrupted build keeps its progress.
+    Failed fetches (None) are reported but never written.
+    """
+    liq: Dict[str, int | None] = {}
+    pending: List[tuple[str, int, float]] = []
+    _cancelled.clear()
+
+    def flush() -> None:
+        if conn is not None and pending:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO liquidity VALUES (?, ?, ?)", pending
+                )
+        pending.clear()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(option_liquidity_metric, t, _yahoo_session): t
+            for t in tickers
+        }
+        try:
+            for i, fut in enumerate(as_completed(futures), 1):
+                tkr = futures[fut]
+                oi = fut.result()
+                liq[tkr] = oi
+                if oi is None:
+                    print(f"[{i:>3}/{len(tickers)}] {tkr:<5} … failed")
+                    continue
+                pending.append((tkr, oi, time.time()))
+                if len(pending) >= WRITE_BATCH:
+                    flush()
+                print(f"[{i:>3}/{len(tickers)}] {tkr:<5} … OI {oi:,}")
+        except BaseException:
+            _cancelled.set()  # e.g. Ctrl-C: running fetches bail out early
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            flush()
+    return {t: liq[t] for t in tickers}  # roster order keeps --seed reproducible
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 2½.  Liquidity-cache helper  (new)
 # ═════════════════════════════════════════════════════════════════════════════
-def load_or_build_liquidity(
-    tickers: List[str], force_refresh: bool = False
-) -> pd.DataFrame:
-    fresh_needed = (
-        force_refresh
-        or not LIQ_CSV_PATH.exists()
-        or (
-            dt.datetime.now() - dt.datetime.fromtimestamp(LIQ_CSV_PATH.stat().st_mtime)
-        ).days > MAX_CACHE_AGE_DAYS
+def open_liquidity_db() -> sqlite3.Connection:
+    """On-disk liquidity store, or a throwaway in-memory one if caching is off."""
+    conn = sqlite3.connect(LIQ_DB_PATH if CACHE_ENABLED else ":memory:")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS liquidity ("
+        "ticker TEXT PRIMARY KEY, oi INTEGER NOT NULL, fetched_at REAL NOT NULL)"
     )
+    return conn
 
-    if not fresh_needed:
-        print("Using cached liquidity table.")
-        return pd.read_csv(LIQ_CSV_PATH, index_col=0)
-
-    print("Pulling fresh open-interest data …")
-    liquidity = build_liquidity_table(tickers)
-
-    ser             = pd.Series(liquidity, name="open_interest")
-    df              = ser.to_frame()
-    df["rank"]      = ser.rank(ascending=False, method="min").astype(int)
-    df["pct_of_max"] = (ser / ser.max() * 100).round(2)
 
-    df.to_csv(LIQ_CSV_PATH)
-    print(f"Saved new liquidity table → {LIQ_CSV_PATH}")
+def load_or_build_liquidity(
+    tickers: List[str], force_refresh: bool = False, max_workers: int = MAX_WORKERS
+) -> pd.DataFrame:
+    """
+    Per-ticker cache: each row carries its own ``fetched_at`` stamp, so only
+    missing or expired tickers are re-fetched. Rank and percent-of-max are
+    always recomputed over the current roster. A ticker whose fetch failed
+    keeps its previous cached value (0 if it has none) for this run only and
+    stays stale, so the next run retries it.
+    """
+    now     = time.time()
+    max_age = MAX_CACHE_AGE_DAYS * 86_400
+
+    with closing(open_liquidity_db()) as conn:
+        cached = {
+            tkr: (oi, fetched_at)
+            for tkr, oi, fetched_at in conn.execute(
+                "SELECT ticker, oi, fetched_at FROM liquidity"
+            )
+        }
+        stale = [
+            t for t in tickers
+            if force_refresh or t not in cached or now - cached[t][1] > max_age
+        ]
+
+        if stale:
+            print(f"Pulling fresh open-interest data for {len(stale)} tickers …")
+            fresh = build_liquidity_table(stale, max_workers=max_workers, conn=conn)
+            failed = sum(oi is None for oi in fresh.values())
+            if CACHE_ENABLED:
+                print(f"Updated {len(fresh) - failed} rows → {LIQ_DB_PATH}")
+            if failed:
+                print(f"  ▸ {failed} failed fetches will be retried next run.")
+        else:
+            fresh = {}
+            print("Using cached liquidity table.")
+
+    liquidity = {
+        t: fresh[t] if fresh.get(t) is not None
+        else cached[t][0] if t in cached else 0
+        for t in tickers
+    }
+
+    ser  = pd.Series(liquidity, name="open_interest")
+    vals = ser.to_numpy()
+    top  = vals.max() if len(vals) else 0
+    df   = ser.to_frame()
+    # "min" ranking: 1 + number of strictly larger values, ties share a rank
+    df["rank"]       = np.searchsorted(np.sort(-vals), -vals, side="left") + 1
+    df["pct_of_max"] = np.round(vals * (100.0 / top if top else 0.0), 2)
     return df
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 3.  Main program
 # ═════════════════════════════════════════════════════════════════════════════
+def positive_int(text: str) -> int:
+    """argparse type: an integer >= 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
 def human(num: int) -> str:
     """Format big ints like 78.9k or 1.2m."""
     if num >= 1_000_000:
@@ -149,6 +384,17 @@ def human(num: int) -> str:
     return str(num)
 
 
+def median(vals: np.ndarray) -> float:
+    """Exact median via O(n) selection (np.partition) instead of a full sort."""
+    n, mid = len(vals), len(vals) // 2
+    if n == 0:
+        return float("nan")
+    if n % 2:
+        return float(np.partition(vals, mid)[mid])
+    part = np.partition(vals, [mid - 1, mid])
+    return (part[mid - 1] + part[mid]) / 2
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Pick N above-median-liquidity S&P-500 tickers."
@@ -159,31 +405,36 @@ def main() -> None:
                         help="force refresh of roster & liquidity caches")
     parser.add_argument("--seed", type=int, default=None,
                         help="set RNG seed for reproducibility")
+    parser.add_argument("-w", "--workers", type=positive_int, default=MAX_WORKERS,
+                        help="parallel open-interest fetches "
+                             f"(default {MAX_WORKERS})")
     args = parser.parse_args()
 
-    if args.seed is not None:
-        random.seed(args.seed)
-    warnings.filterwarnings("ignore", category=UserWarning, module="yfinance")
+    rng = np.random.default_rng(args.seed)
 
     # 1. roster
     sp500 = get_sp500_members(force_refresh=args.refresh)
 
     # 2. liquidity table (cached)
-    df = load_or_build_liquidity(sp500, force_refresh=args.refresh)
+    df = load_or_build_liquidity(
+        sp500, force_refresh=args.refresh, max_workers=args.workers
+    )
 
     # 3. random picks above median
-    median_oi = df["open_interest"].median()
-    eligible  = df.loc[df["open_interest"] > median_oi].index.tolist()
+    vals      = df["open_interest"].to_numpy()
+    median_oi = median(vals)
+    eligible  = df.index.to_numpy()[np.flatnonzero(vals > median_oi)]
     if len(eligible) < args.count:
         raise RuntimeError("Not enough eligible tickers.")
-    picks = random.sample(eligible, args.count)
+    picks = rng.choice(eligible, size=args.count, replace=False)
 
     # 4. pretty output
     print("\n==============================")
     print(f"Median OI: {human(int(median_oi))}")
     print(f"Random pick ({args.count}):\n")
+    rec = df[["open_interest", "rank", "pct_of_max"]].to_dict("index")
     for tkr in picks:
-        row = df.loc[tkr]
+        row = rec[tkr]
         print(
             f"{tkr:<5} | OI {human(int(row['open_interest'])):>6} | "
             f"#{int(row['rank']):>3} | {row['pct_of_max']:>5.1f}%"